@@ -0,0 +1,115 @@
+// Clientside callbacks for the PI Dashboard (served automatically by Dash from assets/).
+// The admin chart is drawn entirely in the browser from the per-PI arrays that
+// show_admin_controls puts in the admin-quota-store, so changing the PI selection,
+// sort order or warning threshold never makes a request to the Dash server.
+
+function component(type, props) {
+    return {namespace: "dash_html_components", type: type, props: props};
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    pi_dash: {
+        set_profile_cookie: function (value, nonce, cookieName) {
+            var enabled = value && value.length > 0 && nonce;
+            document.cookie = cookieName + "=" + (enabled ? nonce : "") +
+                "; path=/; SameSite=Strict" + (enabled ? "" : "; max-age=0");
+            return Boolean(enabled);
+        },
+
+        copy_options: function (options) {
+            return options || [];
+        },
+
+        select_all_pis: function (_, options) {
+            return (options || []).map(function (opt) { return opt.value; });
+        },
+
+        render_admin_chart: function (store, selectedPis, sortBy, threshold) {
+            var hidden = {display: "none"};
+            if (!store) {
+                return [{}, hidden, null, null];
+            }
+            if (!selectedPis || selectedPis.length === 0) {
+                return [{}, hidden, "Please select at least one PI.", null];
+            }
+
+            var limit = (threshold === null || threshold === undefined) ? store.warning_percent : threshold;
+            var index = {};
+            store.pi.forEach(function (pi, i) { index[pi] = i; });
+
+            var rows = [];
+            selectedPis.forEach(function (pi) {
+                var i = index[pi];
+                var usage = i === undefined ? 0 : store.usage[i];
+                var soft = i === undefined ? 0 : store.soft[i];
+                rows.push({
+                    pi: pi,
+                    usage: usage,
+                    remaining: Math.max(0, soft - usage),
+                    percent: soft ? (usage / soft) * 100 : 0
+                });
+            });
+
+            if (sortBy === "usage") {
+                rows.sort(function (a, b) { return b.usage - a.usage; });
+            } else if (sortBy === "percent") {
+                rows.sort(function (a, b) { return b.percent - a.percent; });
+            } else {
+                rows.sort(function (a, b) { return a.pi < b.pi ? -1 : (a.pi > b.pi ? 1 : 0); });
+            }
+
+            var x = [], usage = [], remaining = [], colors = [];
+            var usageHover = [], remainingHover = [], warnings = [];
+            var totalUsage = 0, totalRemaining = 0;
+            rows.forEach(function (row) {
+                x.push(row.pi);
+                usage.push(row.usage);
+                remaining.push(row.remaining);
+                colors.push(row.percent >= limit ? "red" : "blue");
+                usageHover.push(row.pi + ": " + row.usage + " GB used");
+                remainingHover.push(row.pi + ": " + row.remaining + " GB remaining");
+                if (row.percent >= limit) {
+                    warnings.push("PI '" + row.pi + "' is at " + Math.round(row.percent) +
+                                  "% of their total soft limit.");
+                }
+                totalUsage += row.usage;
+                totalRemaining += row.remaining;
+            });
+
+            var figure = {
+                data: [
+                    {type: "bar", x: x, y: usage, name: "Usage", marker: {color: colors},
+                     hovertext: usageHover, hoverinfo: "text+y"},
+                    {type: "bar", x: x, y: remaining, name: "Remaining", marker: {color: "lightgray"},
+                     hovertext: remainingHover, hoverinfo: "text+y"}
+                ],
+                layout: {
+                    barmode: "stack",
+                    title: {text: "PI Usage vs Soft Limit"},
+                    xaxis: {title: {text: "PI"}, categoryorder: "array", categoryarray: x},
+                    yaxis: {title: {text: "Total Usage (GB)"}},
+                    showlegend: false
+                }
+            };
+
+            var summary = [
+                component("H5", {children: "Admin Summary for Selected PIs"}),
+                component("P", {children: "Number of PIs: " + rows.length}),
+                component("P", {children: "Total Usage: " + Math.round(totalUsage) + " GB"}),
+                component("P", {children: "Remaining Quota: " + Math.round(totalRemaining) + " GB"})
+            ];
+
+            var warningDiv = warnings.length === 0 ? null : component("Div", {
+                className: "alert alert-warning",
+                children: [
+                    component("H5", {children: "Warnings"}),
+                    component("Ul", {children: warnings.map(function (w) {
+                        return component("Li", {children: w});
+                    })})
+                ]
+            });
+
+            return [figure, {display: "block"}, summary, warningDiv];
+        }
+    }
+});
@@ -0,0 +1,70 @@
+"""Compare payload size and encode/decode latency of the nested and columnar quota formats.
+
+Builds synthetic /api/v2/admin/quotas/ responses at several cluster sizes and times the
+standard json module against orjson (when installed). Run with: python benchmark_formats.py
+"""
+import json
+import random
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SCALES = [1_000, 10_000, 50_000, 200_000]
+STUDENTS_PER_PI = 20
+REPEATS = 3
+
+
+def make_rows(n):
+    """Generate n (pi, student, usage, soft, hard, files) rows"""
+    rng = random.Random(n)
+    return [
+        (f"pi{i // STUDENTS_PER_PI}", f"student{i}", round(rng.uniform(0, 30), 1), 20, 25, rng.randint(1, 2_000_000))
+        for i in range(n)
+    ]
+
+
+def nested_payload(rows):
+    """Shape of the default get_all_quotas response"""
+    result = {}
+    for pi, student, usage, soft, hard, files in rows:
+        result.setdefault(pi, {})[student] = {"usage": usage, "soft": soft, "hard": hard, "files": files}
+    return result
+
+
+def columnar_payload(rows):
+    """Shape of the ?format=columnar get_all_quotas response"""
+    fields = ("pi", "student", "usage", "soft", "hard", "files")
+    return {field: list(column) for field, column in zip(fields, zip(*rows))}
+
+
+def best_time(fn):
+    """Best of REPEATS wall-clock runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    encoders = [("json", lambda obj: json.dumps(obj).encode(), json.loads)]
+    if orjson is not None:
+        encoders.append(("orjson", orjson.dumps, orjson.loads))
+
+    print(f"{'rows':>8} {'format':>9} {'encoder':>7} {'size (KB)':>10} {'encode (ms)':>12} {'decode (ms)':>12}")
+    for n in SCALES:
+        rows = make_rows(n)
+        for fmt, payload in (("nested", nested_payload(rows)), ("columnar", columnar_payload(rows))):
+            for name, dumps, loads in encoders:
+                body = dumps(payload)
+                encode_ms = best_time(lambda: dumps(payload))
+                decode_ms = best_time(lambda: loads(body))
+                print(f"{n:>8} {fmt:>9} {name:>7} {len(body) / 1024:>10.0f} {encode_ms:>12.1f} {decode_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,46 @@
-from dash import Dash, dcc, html, Input, Output, State, ctx
+from dash import Dash, dcc, html, Input, Output, State, ctx, ClientsideFunction, no_update
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
+from collections import OrderedDict
+import base64
+import flask
+import json
+import random
 import requests
+import secrets
+import threading
+import time
+
+import profiling
 
 PI_DROPDOWN = "pi-dropdown"
 PI_SELECT_ALL_BUTTON = "pi-select-all"
+ADMIN_STORE = "admin-quota-store"
+ADMIN_SORT = "admin-sort"
+ADMIN_THRESHOLD = "admin-threshold"
+PROFILE_TOGGLE = "profile-callbacks"
+PROFILE_COOKIE = "pi_dash_profile"
+FILES_METRIC = "files-metric"
+FILES_SCOPE = "files-scope"
+FILES_TOP_K = "files-top-k"
+
+FILE_METRIC_LABELS = {
+    "files": "Files",
+    "files_per_gb": "Files per GB",
+    "growth": "Growth",
+}
+
+# Usage percentage of the soft limit at which bars turn red and a warning is shown
+USAGE_WARNING_PERCENT = 95
 
 # ==== CONFIG ====
 FASTAPI_URL = "http://localhost:8000"  # your FastAPI base URL
+REFRESH_SECONDS = 60  # how often the charts pull quota changes from the API
+PROFILE_SAMPLE_RATE = 0.0  # fraction of callbacks profiled without an admin asking
+PROFILE_NONCE_SECONDS = 30 * 3600  # lifetime of a profiling nonce, the same as an API token
+MAX_MIRROR_ROWS = 500_000  # rows kept across all quota mirrors; least recently used mirrors are dropped first
+MAX_PROFILE_NONCES = 100  # admin logins that can turn on callback profiling at once
 
 # ==== APP INIT ====
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
@@ -33,6 +65,11 @@ app.layout = html.Div(
         # Hidden storage for token and admin flag
         dcc.Store(id="auth-token"),
         dcc.Store(id="is-admin"),
+        dcc.Store(id="profile-nonce"),
+
+        # Per-PI aggregates for the admin chart, rendered clientside
+        dcc.Store(id=ADMIN_STORE),
+        dcc.Interval(id="quota-refresh", interval=REFRESH_SECONDS * 1000),
 
         # Chart controls and output:
         html.Div(
@@ -52,10 +89,76 @@ app.layout = html.Div(
                 n_clicks=0,
                 className="btn btn-sm btn-secondary mt-2",
                 style={"display": "none"}
+            ),
+            html.Div(
+                id="admin-chart-options",
+                children=[
+                    html.H6("Sort by", className="mt-2"),
+                    dcc.RadioItems(
+                        id=ADMIN_SORT,
+                        options=[
+                            {"label": "PI", "value": "pi"},
+                            {"label": "Usage", "value": "usage"},
+                            {"label": "% of Soft Limit", "value": "percent"},
+                        ],
+                        value="pi",
+                        inline=True,
+                        inputClassName="me-1",
+                        labelClassName="me-3"
+                    ),
+                    html.H6("Warning threshold (% of soft limit)", className="mt-2"),
+                    dcc.Input(
+                        id=ADMIN_THRESHOLD,
+                        type="number",
+                        min=0,
+                        max=100,
+                        value=USAGE_WARNING_PERCENT
+                    ),
+                    dcc.Checklist(
+                        id=PROFILE_TOGGLE,
+                        options=[{"label": "Profile callbacks", "value": "on"}],
+                        value=[],
+                        className="mt-2",
+                        inputClassName="me-1"
+                    ),
+                    dcc.Store(id="profile-cookie"),
+                    dcc.Store(id="profile-cookie-name", data=PROFILE_COOKIE)
+                ],
+                style={"display": "none"}
             )
         ]
     ),
-        html.Div(id="bar-chart")
+        html.Div(id="bar-chart"),
+
+        # Admin chart, filled in by the clientside render_admin_chart callback
+        html.Div(
+            id="admin-chart",
+            children=[
+                html.Div(id="admin-summary", className="mb-4"),
+                html.Div(id="admin-warnings"),
+                dcc.Graph(id="admin-graph", style={"display": "none"}),
+
+                html.H5("Top Users by File Count", className="mt-4"),
+                html.Div([
+                    dcc.Dropdown(
+                        id=FILES_METRIC,
+                        options=[{"label": label, "value": metric} for metric, label in FILE_METRIC_LABELS.items()],
+                        value="files",
+                        clearable=False,
+                        style={"width": "200px"}
+                    ),
+                    dcc.Dropdown(
+                        id=FILES_SCOPE,
+                        options=[],
+                        placeholder="All PIs",
+                        style={"width": "200px"}
+                    ),
+                    dcc.Input(id=FILES_TOP_K, type="number", min=1, max=100, value=10, debounce=True)
+                ], className="d-flex gap-2"),
+                dcc.Graph(id="files-graph")
+            ],
+            style={"display": "none"}
+        )
     ]
 )
 
@@ -63,6 +166,7 @@ app.layout = html.Div(
 @app.callback(
     Output("auth-token", "data"),
     Output("is-admin", "data"),
+    Output("profile-nonce", "data"),
     Output("login-status", "children", allow_duplicate=True),
     Input("login-button", "n_clicks"),
     State("username-input", "value"),
@@ -71,7 +175,7 @@ app.layout = html.Div(
 )
 def login(n_clicks, username, password):
     if not username or not password:
-        return None, False, "Please enter both username and password."
+        return None, False, None, "Please enter both username and password."
 
     try:
         response = requests.post(
@@ -84,166 +188,294 @@ def login(n_clicks, username, password):
         return (
             token_data["access_token"],
             token_data["is_admin"],
+            issue_profile_nonce() if token_data["is_admin"] else None,
             f"Logged in as {token_data['username']}"
         )
     except requests.exceptions.RequestException as e:
-        return None, False, f"Login failed: {str(e)}"
+        return None, False, None, f"Login failed: {str(e)}"
+
+# ==== QUOTA MIRROR ====
+class QuotaMirror:
+    """Local copy of the quota rows in one scope, kept current from /api/v2/quotas/changes.
+
+    The scope is None for the whole cluster, shared by every admin, or a PI's username.
+    Per-PI totals are adjusted as deltas arrive, so a refresh costs time proportional
+    to the number of changed rows rather than the size of the cluster.
+    """
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.cursor = 0
+        self.rows = {}  # quota_id -> (pi, student, usage, soft, hard, files)
+        self.pi_totals = {}  # pi -> [usage, soft, number of rows]
+        self.lock = threading.Lock()
+
+    def _remove(self, quota_id):
+        row = self.rows.pop(quota_id, None)
+        if row is None:
+            return
+        totals = self.pi_totals[row[0]]
+        totals[0] -= row[2]
+        totals[1] -= row[3]
+        totals[2] -= 1
+        if totals[2] == 0:
+            del self.pi_totals[row[0]]
+
+    def _add(self, quota_id, row):
+        self.rows[quota_id] = row
+        totals = self.pi_totals.setdefault(row[0], [0, 0, 0])
+        totals[0] += row[2]
+        totals[1] += row[3]
+        totals[2] += 1
+
+    def _fetch(self, since, headers):
+        response = requests.get(
+            f"{FASTAPI_URL}/api/v2/quotas/changes", params={"since": since}, headers=headers
+        )
+        response.raise_for_status()
+        changes = response.json()
+        # The mirror is shared, so the caller's token must be allowed to see all of it
+        if changes["Scope"] != self.scope:
+            raise PermissionError("Token does not grant access to this quota mirror")
+        return changes
+
+    def refresh(self, headers):
+        """Apply changes since the last refresh; returns True if anything changed.
+
+        Every call asks the API, so it also checks the caller may read this mirror.
+        """
+        with self.lock:
+            changes = self._fetch(self.cursor, headers)
+
+            if changes["Resync"]:
+                # Our cursor predates the retained deletions; rebuild from the full state
+                self.cursor = 0
+                self.rows.clear()
+                self.pi_totals.clear()
+                changes = self._fetch(0, headers)
+
+            upserts = changes["Upserts"]
+            for quota_id in changes["Deletes"]:
+                self._remove(quota_id)
+            for quota_id, *row in zip(
+                upserts["id"], upserts["pi"], upserts["student"], upserts["usage"],
+                upserts["soft"], upserts["hard"], upserts["files"]
+            ):
+                self._remove(quota_id)
+                self._add(quota_id, tuple(row))
+
+            self.cursor = changes["Cursor"]
+            return bool(changes["Deletes"] or upserts["id"])
+
+    def pi_summary(self):
+        """Parallel per-PI arrays for the admin chart store"""
+        with self.lock:
+            pis = sorted(self.pi_totals)
+            return {
+                "pi": pis,
+                "usage": [self.pi_totals[pi][0] for pi in pis],
+                "soft": [self.pi_totals[pi][1] for pi in pis],
+            }
+
+    def members(self):
+        """Mirrored rows in quota_id order"""
+        with self.lock:
+            return [row for _, row in sorted(self.rows.items())]
+
+_mirrors = OrderedDict()  # scope -> QuotaMirror, least recently used first
+_mirrors_lock = threading.Lock()
+
+def token_username(token):
+    """Read the sub claim of a JWT without verifying it; the API checks the token on refresh"""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return str(claims["sub"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return ""
+
+def get_mirror(token, is_admin):
+    """Return the shared admin mirror or the login's PI mirror, evicting least recently used mirrors"""
+    scope = None if is_admin else token_username(token)
+    with _mirrors_lock:
+        mirror = _mirrors.pop(scope, None) or QuotaMirror(scope)
+        _mirrors[scope] = mirror
+        total_rows = sum(len(other.rows) for other in _mirrors.values())
+        while total_rows > MAX_MIRROR_ROWS and len(_mirrors) > 1:
+            _, evicted = _mirrors.popitem(last=False)
+            total_rows -= len(evicted.rows)
+        return mirror
 
 @app.callback(
     Output(PI_DROPDOWN, "options"),
     Output(PI_DROPDOWN, "style"),
     Output(PI_SELECT_ALL_BUTTON, "style"),
     Output("pi-label", "style"),
+    Output("admin-chart-options", "style"),
+    Output("admin-chart", "style"),
+    Output(ADMIN_STORE, "data"),
     Input("is-admin", "data"),
     Input("auth-token", "data"),
+    Input("quota-refresh", "n_intervals"),
     prevent_initial_call=True
 )
-def show_admin_controls(is_admin, token):
+def show_admin_controls(is_admin, token, _):
+    refreshing = ctx.triggered_id == "quota-refresh"
     if not is_admin or not token:
+        if refreshing:
+            return (no_update,) * 7
         hidden = {"display": "none"}
-        return [], hidden, hidden, hidden
+        return [], hidden, hidden, hidden, hidden, hidden, None
 
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(f"{FASTAPI_URL}/api/v2/admin/quotas/", headers=headers)
-    response.raise_for_status()
-    data = response.json()
+    mirror = get_mirror(token, is_admin=True)
+    if not mirror.refresh(headers) and refreshing:
+        return (no_update,) * 7
+    store = mirror.pi_summary()
+    store["warning_percent"] = USAGE_WARNING_PERCENT  # used when the threshold box is empty
 
-    pi_options = [{"label": pi, "value": pi} for pi in data.keys()]
+    pi_options = [{"label": pi, "value": pi} for pi in store["pi"]]
     visible = {"display": "block"}
-    return pi_options, visible, visible, visible
+    return pi_options, visible, visible, visible, visible, visible, store
 
-@app.callback(
+# Selecting PIs, sorting and threshold recoloring never leave the browser;
+# see assets/dashboard.js.
+app.clientside_callback(
+    ClientsideFunction(namespace="pi_dash", function_name="select_all_pis"),
     Output(PI_DROPDOWN, "value"),
     Input(PI_SELECT_ALL_BUTTON, "n_clicks"),
     State(PI_DROPDOWN, "options"),
     prevent_initial_call=True
 )
-def select_all_pis(_, options):
-    return [opt["value"] for opt in options]
+
+app.clientside_callback(
+    ClientsideFunction(namespace="pi_dash", function_name="render_admin_chart"),
+    Output("admin-graph", "figure"),
+    Output("admin-graph", "style"),
+    Output("admin-summary", "children"),
+    Output("admin-warnings", "children"),
+    Input(ADMIN_STORE, "data"),
+    Input(PI_DROPDOWN, "value"),
+    Input(ADMIN_SORT, "value"),
+    Input(ADMIN_THRESHOLD, "value"),
+    prevent_initial_call=True
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="pi_dash", function_name="copy_options"),
+    Output(FILES_SCOPE, "options"),
+    Input(PI_DROPDOWN, "options"),
+    prevent_initial_call=True
+)
+
+# ==== FILE ANALYTICS CALLBACK ====
+@app.callback(
+    Output("files-graph", "figure"),
+    Input(FILES_METRIC, "value"),
+    Input(FILES_SCOPE, "value"),
+    Input(FILES_TOP_K, "value"),
+    Input(ADMIN_STORE, "data"),
+    State("auth-token", "data"),
+    State("is-admin", "data"),
+    prevent_initial_call=True
+)
+def load_file_analytics(metric, pi, k, _, token, is_admin):
+    if not token or not is_admin:
+        return go.Figure()
+
+    headers = {"Authorization": f"Bearer {token}"}
+    params = {"metric": metric, "k": k or 10}
+    if pi:
+        params["pi"] = pi
+    response = requests.get(f"{FASTAPI_URL}/api/v2/admin/analytics/files/top", params=params, headers=headers)
+    response.raise_for_status()
+    top_users = response.json()
+
+    label = FILE_METRIC_LABELS[metric]
+    fig = go.Figure(go.Bar(
+        x=[user[label] for user in reversed(top_users)],
+        y=[f"{user['Student']} ({user['PI']})" for user in reversed(top_users)],
+        orientation="h",
+        marker_color="purple",
+        hovertext=[
+            f"PI: {user['PI']}<br>Lab Member: {user['Student']}<br>Files: {user['Files']}<br>"
+            f"Usage: {user['Usage']} GB<br>Files per GB: {user['Files per GB']}<br>Growth: {user['Growth']}"
+            for user in reversed(top_users)
+        ],
+        hoverinfo="text"
+    ))
+    fig.update_layout(
+        title=f"Top {len(top_users)} Users by {label}" + (f" for PI {pi}" if pi else ""),
+        xaxis_title=label,
+        yaxis_title="Lab Member",
+        showlegend=False
+    )
+    return fig
 
 # ==== LOGOUT CALLBACK ====
 @app.callback(
     Output("auth-token", "clear_data"),
     Output("is-admin", "clear_data"), 
+    Output(ADMIN_STORE, "clear_data"),
+    Output("profile-nonce", "clear_data"),
+    Output(PROFILE_TOGGLE, "value"),
     Output("login-status", "children", allow_duplicate=True),
     Output("bar-chart", "children", allow_duplicate=True),
     Input("logout-button", "n_clicks"),
+    State("profile-nonce", "data"),
     prevent_initial_call=True
 )
-def logout(n_clicks):
-    return True, True, "You have been logged out.", None
+def logout(n_clicks, nonce):
+    with _profile_nonces_lock:
+        _profile_nonces.pop(nonce, None)
+    return True, True, True, True, [], "You have been logged out.", None
 
 # ==== BAR CHART CALLBACK ====
 @app.callback(
     Output("bar-chart", "children"),
     Input("auth-token", "data"),
     Input("is-admin", "data"),
-    Input("pi-dropdown", "value"),
+    Input("quota-refresh", "n_intervals"),
     prevent_initial_call=True
 )
-def load_barchart(token, is_admin, selected_pis):
+def load_barchart(token, is_admin, _):
+    refreshing = ctx.triggered_id == "quota-refresh"
     if not token:
-        return html.Div("Please log in to view data.")
+        return no_update if refreshing else html.Div("Please log in to view data.")
 
     headers = {"Authorization": f"Bearer {token}"}
     usage_data = []
     warnings = []
 
     if is_admin:
-        if not selected_pis:
-            return html.Div("Please select at least one PI.")
-
-        response = requests.get(f"{FASTAPI_URL}/api/v2/admin/quotas/", headers=headers)
-        response.raise_for_status()
-        all_data = response.json()
-
-        pi_summaries = []
-
-        for pi in selected_pis:
-            members = all_data.get(pi, {})
-            pi_usage = sum(stats["usage"] for stats in members.values())
-            pi_soft_limit = sum(stats["soft"] for stats in members.values())
-            pi_remaining = max(0, pi_soft_limit - pi_usage)
-            usage_percent = (pi_usage / pi_soft_limit) * 100 if pi_soft_limit else 0
+        # The admin chart is rendered clientside from the ADMIN_STORE payload
+        return no_update if refreshing else html.Div()
 
-            color = "red" if usage_percent >= 95 else "blue"
-            if usage_percent >= 95:
-                warnings.append(f"PI '{pi}' is at {round(usage_percent)}% of their total soft limit.")
-
-            pi_summaries.append({
-                "PI": pi,
-                "Usage": pi_usage,
-                "Remaining": pi_remaining,
-                "Color": color
-            })
+    else:
+        mirror = get_mirror(token, is_admin=False)
+        if not mirror.refresh(headers) and refreshing:
+            return no_update
 
-        if not pi_summaries:
+        rows = mirror.members()
+        if not rows:
             return html.Div("No usage data found.")
-
-        fig = go.Figure()
-
-        for pi in pi_summaries:
-            fig.add_trace(go.Bar(
-                x=[pi["PI"]],
-                y=[pi["Usage"]],
-                name="Usage",
-                marker_color=pi["Color"],
-                hovertext=f"{pi['PI']}: {pi['Usage']} GB used",
-                hoverinfo="text+y"
-            ))
-
-            fig.add_trace(go.Bar(
-                x=[pi["PI"]],
-                y=[pi["Remaining"]],
-                name="Remaining",
-                marker_color="lightgray",
-                hovertext=f"{pi['PI']}: {pi['Remaining']} GB remaining",
-                hoverinfo="text+y"
-            ))
-
-        fig.update_layout(
-            barmode="stack",
-            title="PI Usage vs Soft Limit",
-            xaxis_title="PI",
-            yaxis_title="Total Usage (GB)",
-            showlegend=False
-        )
-
-        total_usage = sum(pi["Usage"] for pi in pi_summaries)
-        total_remaining = sum(pi["Remaining"] for pi in pi_summaries)
-        avg_usage = round(total_usage / len(pi_summaries), 2) if pi_summaries else 0
-        max_usage = max(pi["Usage"] for pi in pi_summaries) if pi_summaries else 0
-
-        summary = html.Div([
-            html.H5("Admin Summary for Selected PIs"),
-            html.P(f"Number of PIs: {len(pi_summaries)}"),
-            html.P(f"Total Usage: {round(total_usage)} GB"),
-            html.P(f"Remaining Quota: {round(total_remaining)} GB"),
-        ], className="mb-4")
-
-    else:
-        response = requests.get(f"{FASTAPI_URL}/api/v2/members/", headers=headers)
-        response.raise_for_status()
-        members_data = response.json()
-        pi_name = members_data["PI Name"]
-        members = members_data["Users"]
+        pi_name = rows[0][0]
+        members = [row[1] for row in rows]
 
         total_usage = 0
         max_usage = 0
 
-        for member, stats in members.items():
-            usage = stats["usage"]
-            soft = stats["soft"]
+        for _, member, usage, soft, hard, files in rows:
             usage_percent = (usage / soft) * 100 if soft > 0 else 0
             usage_data.append({
                 "PI": pi_name,
                 "Lab Member": member,
                 "Usage": usage,
                 "Remaining": max(0, soft - usage),
-                "Color": "red" if usage_percent >= 95 else "blue",
-                "Hover": f"PI: {pi_name}<br>Lab Member: {member}<br>Usage: {usage} GB<br>Soft Limit: {soft} GB<br>Hard Limit: {stats['hard']} GB<br>Files: {stats['files']}"
+                "Color": "red" if usage_percent >= USAGE_WARNING_PERCENT else "blue",
+                "Hover": f"PI: {pi_name}<br>Lab Member: {member}<br>Usage: {usage} GB<br>Soft Limit: {soft} GB<br>Hard Limit: {hard} GB<br>Files: {files}"
                 })
-            if usage_percent >= 95:
+            if usage_percent >= USAGE_WARNING_PERCENT:
                 warnings.append(f"{member} is at {round(usage_percent)}% of their soft limit.")
 
             total_usage += usage
@@ -306,6 +538,63 @@ def load_barchart(token, is_admin, selected_pis):
         dcc.Graph(figure=fig)
     ])
 
+# ==== CALLBACK PROFILING ====
+# Callback requests are profiled when PROFILE_SAMPLE_RATE picks them or when an admin
+# ticks "Profile callbacks", which stores a random per-login nonce in PROFILE_COOKIE.
+# The cookie is readable by page scripts, so it never holds the API token. Profiles
+# are written by profiling.py and listed by the API at /api/v2/admin/profiles/.
+_profile_nonces = OrderedDict()  # nonce -> expiry, oldest login first
+_profile_nonces_lock = threading.Lock()
+
+def issue_profile_nonce():
+    """Create the profiling nonce for an admin login"""
+    nonce = secrets.token_urlsafe(32)
+    now = time.time()
+    with _profile_nonces_lock:
+        for expired in [key for key, expires in _profile_nonces.items() if expires < now]:
+            del _profile_nonces[expired]
+        _profile_nonces[nonce] = now + PROFILE_NONCE_SECONDS
+        while len(_profile_nonces) > MAX_PROFILE_NONCES:
+            _profile_nonces.popitem(last=False)
+    return nonce
+
+def profile_nonce_valid(nonce):
+    with _profile_nonces_lock:
+        expires = _profile_nonces.get(nonce)
+    return expires is not None and expires >= time.time()
+
+# Also runs when logout clears the nonce, which deletes the cookie
+app.clientside_callback(
+    ClientsideFunction(namespace="pi_dash", function_name="set_profile_cookie"),
+    Output("profile-cookie", "data"),
+    Input(PROFILE_TOGGLE, "value"),
+    Input("profile-nonce", "data"),
+    State("profile-cookie-name", "data"),
+    prevent_initial_call=True
+)
+
+@app.server.before_request
+def start_callback_profile():
+    if not flask.request.path.endswith("_dash-update-component"):
+        return
+    if not profile_nonce_valid(flask.request.cookies.get(PROFILE_COOKIE)) and not (
+        PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+    ):
+        return
+
+    body = flask.request.get_json(silent=True) or {}
+    profile = profiling.Profile("dash", f"callback {body.get('output', '')}")
+    if profile.start():
+        flask.g.profile = profile
+
+# teardown_request runs even when the callback raises, so the profiler is always stopped
+@app.server.teardown_request
+def save_callback_profile(exc):
+    profile = flask.g.pop("profile", None)
+    if profile is not None:
+        profile.stop()
+        profile.save()
+
 # ==== MAIN ====
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
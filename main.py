@@ -1,14 +1,34 @@
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy import Column, Integer, String, Boolean, create_engine
-from sqlalchemy import DateTime, func, Float
-from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy import DateTime, func, Float, Text, Index, inspect, text, cast
+from sqlalchemy.orm import sessionmaker, declarative_base, defer, Session
+from sqlalchemy.schema import CreateIndex
 from pydantic import BaseModel
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import heapq
+import json
 import logging
+import multiprocessing
+import os
+import random
+import threading
+import uuid
+from urllib.parse import parse_qs
 from fastapi.middleware.cors import CORSMiddleware
+import profiling
+import reports
+
+try:
+    import orjson  # Optional fast JSON encoder for large quota responses
+except ImportError:
+    orjson = None
 
 
 logging.basicConfig(level=logging.INFO)
@@ -72,7 +92,40 @@ class QuotaDB(Base):
     usage = Column(Integer)
     soft_limit = Column(Integer)
     hard_limit = Column(Integer)
-    files = Column(Integer)
+    files = Column(Integer, index=True)
+    # files before it last changed; starts equal to files so unchanged rows show no growth.
+    # Maintained by the quota triggers, so bulk and raw SQL writes keep it current too
+    prev_files = Column(Integer, info={"backfill_from": "files"})
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0", index=True)
+
+    __table_args__ = (Index("ix_quotas_pi_name_change_seq", "pi_name", "change_seq"),)
+
+
+# Expressions for the file analytics endpoint, indexed so cluster-wide top-K queries
+# read only the first K index entries
+FILES_PER_GB = cast(QuotaDB.files, Float) / QuotaDB.usage
+FILES_GROWTH = QuotaDB.files - QuotaDB.prev_files
+Index("ix_quotas_files_per_gb", FILES_PER_GB)
+Index("ix_quotas_files_growth", FILES_GROWTH)
+
+
+class QuotaDeletionDB(Base):
+    """SQLAlchemy Model for tombstones of deleted quota rows, read by the changes endpoint"""
+    __tablename__ = "quota_deletions"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    quota_id = Column(Integer, nullable=False)
+    pi_name = Column(String, nullable=False)
+    change_seq = Column(Integer, nullable=False, index=True)
+
+
+class ChangeSequenceDB(Base):
+    """SQLAlchemy Model for the single-row counter that hands out quota change sequence numbers"""
+    __tablename__ = "change_sequence"
+
+    id = Column(Integer, primary_key=True)
+    seq = Column(Integer, nullable=False, default=0)
+    pruned_through = Column(Integer, nullable=False, default=0, server_default="0")  # oldest cursor still served
 
 # Database Model for Login History
 class LoginHistoryDB(Base):
@@ -98,15 +151,128 @@ class SummaryHistoryDB(Base):
     max_individual_usage = Column(Integer, nullable=False)
 
 
+# Database Model for Background Report Jobs
+class ReportJobDB(Base):
+    """SQLAlchemy Model for admin reports run by the background job runner"""
+    __tablename__ = "report_jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False, index=True)
+    params = Column(String, nullable=False)  # Canonical JSON, part of the cache key
+    data_version = Column(String, nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done, failed
+    progress = Column(Float, default=0.0)
+    result = Column(Text)  # JSON encoded report
+    error = Column(String)
+    submitted_by = Column(String, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    finished_at = Column(DateTime)
+
+
+# Quota Change Tracking
+# Every insert or update of a quota row stamps it with the next change sequence number,
+# and every delete leaves a tombstone carrying one, so clients can ask for what changed
+# after the last sequence number they saw. SQLite triggers do the stamping, so bulk
+# query.update()/delete() calls and raw SQL are tracked the same as ORM flushes. Numbers
+# come from the change_sequence row; bumping it takes SQLite's write lock, so writers
+# commit in sequence order.
+MAX_TOMBSTONES = 50_000  # Deletions kept for incremental clients; older cursors must resync
+TOMBSTONE_PRUNE_EVERY = 1_000  # Tombstone inserts between prunes
+
+# Columns whose change is reported to clients; writes that leave them all as they were
+# are not stamped
+TRACKED_QUOTA_COLUMNS = ("quota_id", "pi_name", "student_name", "usage", "soft_limit", "hard_limit", "files")
+
+QUOTA_TRIGGERS = {
+    "quotas_stamp_insert": """
+        CREATE TRIGGER quotas_stamp_insert AFTER INSERT ON quotas
+        BEGIN
+            UPDATE change_sequence SET seq = seq + 1 WHERE id = 1;
+            UPDATE quotas SET
+                change_seq = (SELECT seq FROM change_sequence WHERE id = 1),
+                prev_files = COALESCE(NEW.prev_files, NEW.files)
+            WHERE quota_id = NEW.quota_id;
+        END
+    """,
+    "quotas_stamp_update": f"""
+        CREATE TRIGGER quotas_stamp_update AFTER UPDATE ON quotas
+        WHEN {" OR ".join(f"OLD.{column} IS NOT NEW.{column}" for column in TRACKED_QUOTA_COLUMNS)}
+        BEGIN
+            UPDATE change_sequence SET seq = seq + 1 WHERE id = 1;
+            UPDATE quotas SET
+                change_seq = (SELECT seq FROM change_sequence WHERE id = 1),
+                prev_files = CASE WHEN OLD.files IS NOT NEW.files THEN OLD.files ELSE NEW.prev_files END
+            WHERE quota_id = NEW.quota_id;
+        END
+    """,
+    "quotas_tombstone_delete": """
+        CREATE TRIGGER quotas_tombstone_delete AFTER DELETE ON quotas
+        BEGIN
+            UPDATE change_sequence SET seq = seq + 1 WHERE id = 1;
+            INSERT INTO quota_deletions (quota_id, pi_name, change_seq)
+            SELECT OLD.quota_id, OLD.pi_name, seq FROM change_sequence WHERE id = 1;
+        END
+    """,
+    # Keep only the newest MAX_TOMBSTONES and record the oldest cursor still served
+    "quota_deletions_prune": f"""
+        CREATE TRIGGER quota_deletions_prune AFTER INSERT ON quota_deletions
+        WHEN NEW.id % {TOMBSTONE_PRUNE_EVERY} = 0
+        BEGIN
+            UPDATE change_sequence SET pruned_through = MAX(pruned_through, COALESCE((
+                SELECT change_seq FROM quota_deletions
+                ORDER BY change_seq DESC LIMIT 1 OFFSET {MAX_TOMBSTONES}
+            ), 0)) WHERE id = 1;
+            DELETE FROM quota_deletions
+            WHERE change_seq <= (SELECT pruned_through FROM change_sequence WHERE id = 1);
+        END
+    """,
+}
+
+def current_change_seq(db: Session) -> int:
+    """Highest change sequence number handed out by a committed transaction"""
+    return db.query(ChangeSequenceDB.seq).filter(ChangeSequenceDB.id == 1).scalar() or 0
+
 # Create the database tables
 Base.metadata.create_all(bind=engine)
 
+def migrate_db():
+    """Add columns and indexes introduced after an existing database file was created"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+                conn.execute(text(ddl))
+                if "backfill_from" in column.info:
+                    conn.execute(text(f"UPDATE {table.name} SET {column.name} = {column.info['backfill_from']}"))
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+        # Seed the change counter past any sequence numbers already in use
+        conn.execute(text(
+            "INSERT INTO change_sequence (id, seq) SELECT 1, MAX("
+            "(SELECT COALESCE(MAX(change_seq), 0) FROM quotas), "
+            "(SELECT COALESCE(MAX(change_seq), 0) FROM quota_deletions)) "
+            "WHERE NOT EXISTS (SELECT 1 FROM change_sequence)"
+        ))
+
+        # Recreate the triggers so edits to their definitions reach existing databases
+        for name, ddl in QUOTA_TRIGGERS.items():
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            conn.execute(text(ddl))
+
+migrate_db()
+
 def init_db():
     """Reinitialize users and quota data (but preserve logs/history)."""
     db = SessionLocal()
 
-    #Delete existing users and quotas (preserve login/summary history)
-    db.query(QuotaDB).delete()
+    #Delete existing users (preserve login/summary history)
     db.query(UserDB).delete()
     db.commit()
 
@@ -126,7 +292,7 @@ def init_db():
         )
         db.add(new_user)
 
-    #Recreate quotas
+    #Sync quotas in place, so unchanged rows keep their change sequence and file growth
     test_quotas = [
         QuotaDB(pi_name="amy", student_name="tom", usage=19.6, soft_limit=20, hard_limit=25, files=13),
         QuotaDB(pi_name="amy", student_name="amy", usage=10.8, soft_limit=20, hard_limit=25, files=13),
@@ -134,8 +300,16 @@ def init_db():
         QuotaDB(pi_name="bob", student_name="alice", usage=14.7, soft_limit=15, hard_limit=30, files=8),
     ]
 
+    existing = {(quota.pi_name, quota.student_name): quota for quota in db.query(QuotaDB).all()}
     for quota in test_quotas:
-        db.add(quota)
+        current = existing.pop((quota.pi_name, quota.student_name), None)
+        if current is None:
+            db.add(quota)
+        else:
+            for column in ("usage", "soft_limit", "hard_limit", "files"):
+                setattr(current, column, getattr(quota, column))
+    for stale in existing.values():
+        db.delete(stale)
 
     db.commit()
     db.close()
@@ -161,6 +335,179 @@ class User(BaseModel):
 class UserInDB(User):
     hashed_password: str
 
+class ReportRequest(BaseModel):
+    kind: str
+    params: dict = {}
+
+# Columnar Response Format
+# Quota endpoints can return parallel arrays per field instead of one nested dict per
+# student, requested with ?format=columnar or an Accept header of COLUMNAR_MEDIA_TYPE.
+COLUMNAR_MEDIA_TYPE = "application/vnd.pidash.columnar+json"
+
+def wants_columnar(request: Request, format: str | None) -> bool:
+    """Decide whether the client asked for the columnar quota format"""
+    if format is not None:
+        if format not in ("nested", "columnar"):
+            raise HTTPException(status_code=400, detail="format must be 'nested' or 'columnar'")
+        return format == "columnar"
+    return COLUMNAR_MEDIA_TYPE in request.headers.get("accept", "")
+
+def json_response(content, media_type: str = "application/json") -> Response:
+    """Encode a response with orjson when available, falling back to the standard encoder"""
+    if orjson is not None:
+        return Response(orjson.dumps(content), media_type=media_type)
+    return JSONResponse(content, media_type=media_type)
+
+def quota_columns(rows, fields):
+    """Transpose (field, ...) tuples from a column query into a dict of parallel arrays"""
+    columns = {field: [] for field in fields}
+    appenders = [columns[field].append for field in fields]
+    for row in rows:
+        for append, value in zip(appenders, row):
+            append(value)
+    return columns
+
+# Background Report Jobs
+# Expensive admin reports run on a bounded process pool instead of inside the request
+# handler. Job state lives in the report_jobs table; a finished job is reused for any
+# later request with the same kind, params and data version.
+REPORT_WORKERS = 2
+REPORT_POLL_SECONDS = 0.5
+REPORT_MAX_AGE = timedelta(days=7)  # Finished jobs, and their stored results, are deleted after this
+REPORT_MAX_JOBS = 200  # Only the newest finished jobs are kept beyond this many
+MAX_REPORT_PAGE = 200
+_report_pool = None
+_report_pool_lock = threading.Lock()
+
+def get_report_pool():
+    """Create the report process pool on first use"""
+    global _report_pool
+    with _report_pool_lock:
+        if _report_pool is None:
+            # Spawned workers start clean instead of inheriting this threaded process's
+            # state and open SQLite connections; reports.py opens its own engine
+            _report_pool = ProcessPoolExecutor(
+                max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _report_pool
+
+def discard_report_pool(pool):
+    """Drop a pool whose worker died so the next submit starts a fresh one"""
+    global _report_pool
+    with _report_pool_lock:
+        if _report_pool is pool:
+            _report_pool = None
+    pool.shutdown(wait=False)
+
+# How to tell whether each table a report can read has changed since a job was run
+TABLE_VERSIONS = {
+    "quotas": current_change_seq,
+    "summary_history": lambda db: db.query(func.max(SummaryHistoryDB.id)).scalar(),
+}
+
+def data_version(db: Session, kind: str) -> str:
+    """Versions of the tables this report reads, used as the report cache key"""
+    _, tables = reports.REPORTS[kind]
+    return ":".join(str(TABLE_VERSIONS[table](db)) for table in tables)
+
+def report_failed(job_id: str, pool, future):
+    """Mark a job failed if its worker process died before recording an outcome"""
+    if future.exception() is None:
+        return
+    if isinstance(future.exception(), BrokenProcessPool):
+        discard_report_pool(pool)
+    db = SessionLocal()
+    try:
+        job = db.get(ReportJobDB, job_id)
+        if job and job.status in ("queued", "running"):
+            job.status = "failed"
+            job.error = str(future.exception())
+            job.finished_at = datetime.now(timezone.utc)
+            db.commit()
+    finally:
+        db.close()
+
+def submit_report(db: Session, kind: str, params: dict, username: str) -> ReportJobDB:
+    """Return a cached or in-flight job for this report, or queue a new one"""
+    params_key = json.dumps(params, sort_keys=True)
+    version = data_version(db, kind)
+
+    existing = db.query(ReportJobDB).filter(
+        ReportJobDB.kind == kind,
+        ReportJobDB.params == params_key,
+        ReportJobDB.data_version == version,
+        ReportJobDB.status.in_(("queued", "running", "done"))
+    ).order_by(ReportJobDB.created_at.desc()).first()
+    if existing:
+        return existing
+
+    prune_report_jobs(db)
+    job = ReportJobDB(
+        id=uuid.uuid4().hex, kind=kind, params=params_key, data_version=version,
+        status="queued", progress=0.0, submitted_by=username
+    )
+    db.add(job)
+    db.commit()
+
+    for attempt in range(2):
+        pool = get_report_pool()
+        try:
+            future = pool.submit(reports.run_report, job.id, kind, params, DATABASE_URL)
+            break
+        except BrokenProcessPool:
+            # A worker died since the last submit; retry once on a new pool
+            discard_report_pool(pool)
+            if attempt:
+                job.status = "failed"
+                job.error = "Report workers are unavailable"
+                job.finished_at = datetime.now(timezone.utc)
+                db.commit()
+                return job
+    future.add_done_callback(lambda f, job_id=job.id, pool=pool: report_failed(job_id, pool, f))
+    return job
+
+def report_status(job: ReportJobDB) -> dict:
+    return {
+        "Job ID": job.id,
+        "Kind": job.kind,
+        "Params": json.loads(job.params),
+        "Status": job.status,
+        "Progress": job.progress,
+        "Error": job.error,
+        "Submitted By": job.submitted_by,
+        "Created": job.created_at.isoformat() if job.created_at else None,
+        "Finished": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+def prune_report_jobs(db: Session):
+    """Delete finished jobs older than REPORT_MAX_AGE or beyond the newest REPORT_MAX_JOBS"""
+    finished = db.query(ReportJobDB).filter(ReportJobDB.status.in_(("done", "failed")))
+    finished.filter(
+        ReportJobDB.created_at < datetime.now(timezone.utc).replace(tzinfo=None) - REPORT_MAX_AGE
+    ).delete(synchronize_session=False)
+
+    stale = finished.with_entities(ReportJobDB.id).order_by(
+        ReportJobDB.created_at.desc()
+    ).offset(REPORT_MAX_JOBS).all()
+    if stale:
+        db.query(ReportJobDB).filter(ReportJobDB.id.in_([job_id for (job_id,) in stale])).delete(
+            synchronize_session=False
+        )
+    db.commit()
+
+def recover_report_jobs():
+    """Fail jobs left unfinished by a previous server process; their workers are gone"""
+    db = SessionLocal()
+    db.query(ReportJobDB).filter(ReportJobDB.status.in_(("queued", "running"))).update(
+        {"status": "failed", "error": "Server restarted before the report finished"},
+        synchronize_session=False
+    )
+    db.commit()
+    prune_report_jobs(db)
+    db.close()
+
+recover_report_jobs()
+
 # Dependency to Get Database Session
 def get_db():
     db = SessionLocal()
@@ -232,6 +579,68 @@ async def get_current_active_user(current_user: UserDB = Depends(get_current_use
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+# Request Profiling
+# Admins can profile a single request by sending an X-Profile header or ?profile=1;
+# PROFILE_SAMPLE_RATE additionally profiles that fraction of all requests. Requests
+# that are not selected go straight to the app.
+PROFILE_SAMPLE_RATE = 0.0
+
+def token_is_admin(token: str) -> bool:
+    """Check a bearer token without raising, for use outside the dependency system"""
+    try:
+        username = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return False
+
+    db = SessionLocal()
+    try:
+        user = get_user(db, username) if username else None
+        return bool(user and user.is_admin and not user.disabled)
+    finally:
+        db.close()
+
+PROFILE_FLAG_VALUES = ("1", "true")  # X-Profile header or ?profile= values that request a profile
+
+def profile_requested(scope) -> bool:
+    """Whether an admin flagged this request for profiling or it was sampled"""
+    if not profiling.ASYNC_SUPPORTED:
+        return False  # cProfile would mix in other requests running on the event loop
+
+    flagged = dict(scope["headers"]).get(b"x-profile", b"").decode().lower() in PROFILE_FLAG_VALUES
+    if not flagged and b"profile" in scope["query_string"]:
+        flagged = parse_qs(scope["query_string"].decode()).get("profile", [""])[0] in PROFILE_FLAG_VALUES
+
+    if flagged:
+        authorization = dict(scope["headers"]).get(b"authorization", b"").decode()
+        scheme, _, token = authorization.partition(" ")
+        return scheme.lower() == "bearer" and token_is_admin(token)
+
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles selected requests, including their SQL statements"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = profiling.Profile("api", f"{scope['method']} {scope['path']}", engine=engine)
+        if not profile.start():
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profile.stop()
+            profile.save()
+
+app.add_middleware(ProfilingMiddleware)
+
 # API Endpoints
 
 @app.post("/token", response_model=Token)
@@ -312,8 +721,24 @@ async def get_all_users(db: Session = Depends(get_db)):
     return [{"username": user.username, "email": user.email} for user in users]
 
 @app.get("/api/v2/members/")
-async def get_members(current_user: UserDB = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def get_members(
+    request: Request,
+    format: str | None = None,
+    current_user: UserDB = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
     """Retrieve students under the currently logged-in PI from the database"""
+    if wants_columnar(request, format):
+        rows = db.query(
+            QuotaDB.student_name, QuotaDB.usage, QuotaDB.soft_limit, QuotaDB.hard_limit, QuotaDB.files
+        ).filter(QuotaDB.pi_name == current_user.username).all()
+
+        if not rows:
+            raise HTTPException(status_code=404, detail="No users found for this PI")
+
+        members = quota_columns(rows, ("student", "usage", "soft", "hard", "files"))
+        return json_response({"PI Name": current_user.username, "Users": members}, COLUMNAR_MEDIA_TYPE)
+
     quotas = db.query(QuotaDB).filter(QuotaDB.pi_name == current_user.username).all()
 
     if not quotas:
@@ -348,11 +773,24 @@ async def get_summary_history(current_user: UserDB = Depends(get_current_active_
     ]
 
 @app.get("/api/v2/admin/quotas/")
-async def get_all_quotas(current_user: UserDB = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def get_all_quotas(
+    request: Request,
+    format: str | None = None,
+    current_user: UserDB = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
     """Allow admin to view all quota data across PIs."""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
 
+    if wants_columnar(request, format):
+        rows = db.query(
+            QuotaDB.pi_name, QuotaDB.student_name, QuotaDB.usage,
+            QuotaDB.soft_limit, QuotaDB.hard_limit, QuotaDB.files
+        ).order_by(QuotaDB.pi_name).all()
+        columns = quota_columns(rows, ("pi", "student", "usage", "soft", "hard", "files"))
+        return json_response(columns, COLUMNAR_MEDIA_TYPE)
+
     quotas = db.query(QuotaDB).all()
     if not quotas:
         return []
@@ -404,4 +842,242 @@ async def get_summary(current_user: UserDB = Depends(get_current_active_user), d
     db.add(summary_entry)
     db.commit()
 
-    return summary_data
\ No newline at end of file
+    return summary_data
+
+def get_admin_report_job(job_id: str, current_user: UserDB, db: Session) -> ReportJobDB:
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    job = db.get(ReportJobDB, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+@app.post("/api/v2/admin/reports/")
+async def create_report(
+    report: ReportRequest,
+    current_user: UserDB = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Submit a background report and return its job, reusing a cached result when the data is unchanged."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    if report.kind not in reports.REPORTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown report kind. Available: {', '.join(reports.REPORTS)}"
+        )
+
+    job = submit_report(db, report.kind, report.params, current_user.username)
+    return report_status(job)
+
+@app.get("/api/v2/admin/reports/")
+async def list_reports(
+    limit: int = 50,
+    offset: int = 0,
+    current_user: UserDB = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """List report jobs, newest first, `limit` at a time starting at `offset`."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if not 1 <= limit <= MAX_REPORT_PAGE or offset < 0:
+        raise HTTPException(
+            status_code=400, detail=f"limit must be between 1 and {MAX_REPORT_PAGE} and offset at least 0"
+        )
+
+    jobs = db.query(ReportJobDB).options(defer(ReportJobDB.result)).order_by(
+        ReportJobDB.created_at.desc()
+    ).offset(offset).limit(limit).all()
+    return [report_status(job) for job in jobs]
+
+@app.get("/api/v2/admin/reports/{job_id}")
+async def get_report_status(
+    job_id: str,
+    current_user: UserDB = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Poll the status and progress of a report job."""
+    return report_status(get_admin_report_job(job_id, current_user, db))
+
+@app.get("/api/v2/admin/reports/{job_id}/events")
+async def stream_report_status(
+    job_id: str,
+    current_user: UserDB = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Stream report progress as server-sent events until the job finishes."""
+    get_admin_report_job(job_id, current_user, db)
+
+    async def events():
+        last = None
+        while True:
+            poll_db = SessionLocal()
+            try:
+                status_data = report_status(poll_db.get(ReportJobDB, job_id))
+            finally:
+                poll_db.close()
+
+            if status_data != last:
+                yield f"data: {json.dumps(status_data)}\n\n"
+                last = status_data
+            if status_data["Status"] in ("done", "failed"):
+                return
+            await asyncio.sleep(REPORT_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/api/v2/admin/reports/{job_id}/result")
+async def get_report_result(
+    job_id: str,
+    current_user: UserDB = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Fetch the result of a finished report job."""
+    job = get_admin_report_job(job_id, current_user, db)
+
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Report failed: {job.error}")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Report is {job.status}")
+
+    # Stored already encoded, so a cached report is served without re-serializing it
+    return Response(job.result, media_type="application/json")
+
+@app.get("/api/v2/quotas/changes")
+async def get_quota_changes(
+    since: int = 0,
+    current_user: UserDB = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Return quota rows changed and deleted after change sequence `since`.
+
+    Admins see every PI, everyone else only their own; "Scope" is null for all PIs or
+    the PI's username, so shared caches can check a token covers them. Clients should
+    apply deletes before upserts, since a deleted quota_id can be reused by a later
+    insert, and pass back "Cursor" as `since` on the next call. since=0 returns the
+    full current state.
+    If the deletions after `since` have been pruned, or `since` is ahead of the server
+    (the database was recreated), the response has "Resync": true and no changes, and
+    the client should start over with since=0.
+    """
+    if since < 0:
+        raise HTTPException(status_code=400, detail="since must be at least 0")
+
+    cursor, pruned_through = db.query(ChangeSequenceDB.seq, ChangeSequenceDB.pruned_through).filter(
+        ChangeSequenceDB.id == 1
+    ).one()
+
+    fields = ("id", "pi", "student", "usage", "soft", "hard", "files")
+    scope = None if current_user.is_admin else current_user.username
+    if 0 < since < pruned_through or since > cursor:
+        return json_response({
+            "Cursor": cursor, "Scope": scope, "Resync": True, "Upserts": quota_columns([], fields), "Deletes": []
+        })
+
+    upserts = db.query(
+        QuotaDB.quota_id, QuotaDB.pi_name, QuotaDB.student_name, QuotaDB.usage,
+        QuotaDB.soft_limit, QuotaDB.hard_limit, QuotaDB.files
+    ).filter(QuotaDB.change_seq > since, QuotaDB.change_seq <= cursor)
+    deletes = db.query(QuotaDeletionDB.quota_id).filter(
+        QuotaDeletionDB.change_seq > since, QuotaDeletionDB.change_seq <= cursor
+    )
+    if not current_user.is_admin:
+        upserts = upserts.filter(QuotaDB.pi_name == current_user.username)
+        deletes = deletes.filter(QuotaDeletionDB.pi_name == current_user.username)
+
+    return json_response({
+        "Cursor": cursor,
+        "Scope": scope,
+        "Resync": False,
+        "Upserts": quota_columns(upserts.all(), fields),
+        "Deletes": [] if since == 0 else [quota_id for (quota_id,) in deletes.all()],
+    })
+
+@app.get("/api/v2/admin/profiles/")
+async def list_request_profiles(current_user: UserDB = Depends(get_current_active_user)):
+    """List stored API and Dash callback profiles with their SQL totals, newest first."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return profiling.list_profiles()
+
+@app.get("/api/v2/admin/profiles/{name}/sql")
+async def get_request_profile_sql(name: str, current_user: UserDB = Depends(get_current_active_user)):
+    """Return the duration of each SQL statement recorded by a stored profile."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    statements = profiling.load_profile_sql(name)
+    if statements is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return statements
+
+@app.get("/api/v2/admin/profiles/{name}")
+async def download_request_profile(name: str, current_user: UserDB = Depends(get_current_active_user)):
+    """Download a stored profile (.speedscope.json for speedscope, .prof for snakeviz/flameprof)."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    for metadata in profiling.list_profiles():
+        if metadata["Name"] == name:
+            return FileResponse(os.path.join(profiling.PROFILE_DIR, metadata["File"]), filename=metadata["File"])
+
+    raise HTTPException(status_code=404, detail="Profile not found")
+
+FILE_METRICS = {
+    "files": QuotaDB.files,
+    "files_per_gb": FILES_PER_GB,
+    "growth": FILES_GROWTH,
+}
+MAX_TOP_K = 1000
+
+@app.get("/api/v2/admin/analytics/files/top")
+async def get_top_file_users(
+    metric: str = "files",
+    k: int = 10,
+    pi: str | None = None,
+    current_user: UserDB = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Top-K students by file count, files per GB of usage, or file growth since their file count last changed.
+
+    Cluster-wide queries walk the matching quotas index; per-PI queries load that PI's
+    students through the pi_name index and pick the top K with a heap.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    if metric not in FILE_METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric. Available: {', '.join(FILE_METRICS)}")
+    if not 1 <= k <= MAX_TOP_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_TOP_K}")
+
+    expression = FILE_METRICS[metric]
+    columns = (
+        QuotaDB.pi_name, QuotaDB.student_name, QuotaDB.usage,
+        QuotaDB.files, FILES_PER_GB.label("files_per_gb"), FILES_GROWTH.label("growth"), QuotaDB.quota_id
+    )
+
+    # Ties go to the newest quota row; the index stores quota_id after the metric, so
+    # ordering on both still reads the index without sorting
+    if pi is None:
+        rows = db.query(*columns).filter(expression.isnot(None)).order_by(
+            expression.desc(), QuotaDB.quota_id.desc()
+        ).limit(k).all()
+    else:
+        candidates = db.query(*columns).filter(QuotaDB.pi_name == pi, expression.isnot(None)).all()
+        rows = heapq.nlargest(k, candidates, key=lambda row: (getattr(row, metric), row.quota_id))
+
+    return [
+        {
+            "PI": pi_name,
+            "Student": student_name,
+            "Usage": usage,
+            "Files": files,
+            "Files per GB": round(files_per_gb, 1) if files_per_gb is not None else None,
+            "Growth": growth,
+        }
+        for pi_name, student_name, usage, files, files_per_gb, growth, _ in rows
+    ]
@@ -0,0 +1,191 @@
+"""On-demand profiling shared by the FastAPI backend and the Dash app.
+
+A Profile wraps a single API request or Dash callback. It uses pyinstrument when
+installed, saving a speedscope flamegraph, and falls back to cProfile, saving a
+.prof file for snakeviz or flameprof. When given an engine it also records the
+duration of each SQL statement the profiled code executes. Nothing is hooked in
+unless a profile is active, so there is no cost when profiling is off.
+
+Only one profile runs at a time per process, since Python allows a single active
+profiler; work arriving while one is running simply goes unprofiled. cProfile
+records everything its thread runs, including other requests' coroutines on the
+same event loop, so async code should only be profiled when ASYNC_SUPPORTED.
+
+Profiles are written to PROFILE_DIR next to a JSON metadata file and a .sql.json
+file with the per-statement timings, and only the newest PROFILE_MAX_COUNT are kept.
+"""
+import cProfile
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+try:
+    import pyinstrument  # Optional, gives real call stacks and speedscope output
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:
+    pyinstrument = None
+
+# pyinstrument's async mode attributes awaits to the coroutine being profiled
+ASYNC_SUPPORTED = pyinstrument is not None
+
+PROFILE_DIR = "./profiles"
+PROFILE_MAX_COUNT = 100  # Older profiles are deleted once this many are stored
+
+_active_lock = threading.Lock()
+_current_profile = contextvars.ContextVar("current_profile", default=None)
+_sql_lock = threading.Lock()
+_sql_watchers = {}  # engine -> number of active Profiles collecting SQL timings on it
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    starts = conn.info.get("profile_query_start")
+    if profile is None or not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    profile.sql.append({"statement": statement, "ms": round(elapsed_ms, 3)})
+
+
+class Profile:
+    """Profile the code run between start() and stop(), then save() the result"""
+
+    def __init__(self, source: str, label: str, engine=None):
+        self.source = source
+        self.label = label
+        self.engine = engine
+        self.sql = []
+        self.profiler = None
+        self.duration_ms = 0.0
+
+    def start(self) -> bool:
+        """Begin profiling; returns False if another profile is already running"""
+        if not _active_lock.acquire(blocking=False):
+            return False
+        if self.engine is not None:
+            self._watch_sql()
+        self._token = _current_profile.set(self)
+        self.started = time.perf_counter()
+        if pyinstrument is not None:
+            self.profiler = pyinstrument.Profiler(async_mode="enabled")
+            self.profiler.start()
+        else:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return True
+
+    def stop(self):
+        try:
+            if pyinstrument is not None:
+                self.profiler.stop()
+            else:
+                self.profiler.disable()
+            self.duration_ms = (time.perf_counter() - self.started) * 1000
+            _current_profile.reset(self._token)
+        finally:
+            if self.engine is not None:
+                self._unwatch_sql()
+            _active_lock.release()
+
+    def _watch_sql(self):
+        with _sql_lock:
+            if not _sql_watchers.get(self.engine):
+                event.listen(self.engine, "before_cursor_execute", _before_cursor_execute)
+                event.listen(self.engine, "after_cursor_execute", _after_cursor_execute)
+            _sql_watchers[self.engine] = _sql_watchers.get(self.engine, 0) + 1
+
+    def _unwatch_sql(self):
+        with _sql_lock:
+            _sql_watchers[self.engine] -= 1
+            if not _sql_watchers[self.engine]:
+                event.remove(self.engine, "before_cursor_execute", _before_cursor_execute)
+                event.remove(self.engine, "after_cursor_execute", _after_cursor_execute)
+                del _sql_watchers[self.engine]
+
+    def save(self) -> dict:
+        """Write the profile and its metadata to PROFILE_DIR, then apply retention"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        created = datetime.now(timezone.utc)
+        name = f"{created.strftime('%Y%m%dT%H%M%S%f')}-{self.source}-{uuid.uuid4().hex[:8]}"
+
+        if pyinstrument is not None:
+            filename = f"{name}.speedscope.json"
+            with open(os.path.join(PROFILE_DIR, filename), "w") as f:
+                f.write(self.profiler.output(SpeedscopeRenderer()))
+        else:
+            filename = f"{name}.prof"
+            self.profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+
+        metadata = {
+            "Name": name,
+            "Source": self.source,
+            "Label": self.label,
+            "Created": created.isoformat(),
+            "Duration (ms)": round(self.duration_ms, 3),
+            "Profiler": "pyinstrument" if pyinstrument is not None else "cProfile",
+            "File": filename,
+            "SQL Statements": len(self.sql),
+            "SQL Total (ms)": round(sum(query["ms"] for query in self.sql), 3),
+        }
+        with open(os.path.join(PROFILE_DIR, f"{name}.sql.json"), "w") as f:
+            json.dump(self.sql, f)
+        with open(os.path.join(PROFILE_DIR, f"{name}.json"), "w") as f:
+            json.dump(metadata, f)
+
+        prune_profiles()
+        return metadata
+
+
+def list_profiles() -> list[dict]:
+    """Metadata of stored profiles, newest first, without the per-statement SQL timings"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+
+    profiles = []
+    for entry in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if entry.endswith(".json") and not entry.endswith((".speedscope.json", ".sql.json")):
+            try:
+                with open(os.path.join(PROFILE_DIR, entry)) as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue  # Removed or still being written by another process
+            metadata.pop("SQL", None)  # Stored inline by older versions
+            profiles.append(metadata)
+    return profiles
+
+
+def load_profile_sql(name: str) -> list[dict] | None:
+    """Per-statement SQL timings of a stored profile, or None if there is no such profile"""
+    for metadata in list_profiles():
+        if metadata["Name"] == name:
+            break
+    else:
+        return None
+
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{name}.sql.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    with open(os.path.join(PROFILE_DIR, f"{name}.json")) as f:
+        return json.load(f).get("SQL", [])
+
+
+def prune_profiles():
+    """Delete all but the newest PROFILE_MAX_COUNT profiles"""
+    for metadata in list_profiles()[PROFILE_MAX_COUNT:]:
+        for filename in (metadata["File"], f"{metadata['Name']}.sql.json", f"{metadata['Name']}.json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, filename))
+            except FileNotFoundError:
+                pass
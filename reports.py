@@ -0,0 +1,158 @@
+"""Admin reports executed by the background job runner in main.py.
+
+Reports run in worker processes, so they open their own database connection
+instead of sharing the API's session, and record their progress and result
+directly on their row of the report_jobs table.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, text
+
+PROGRESS_STEPS = 10  # Number of progress updates written per report
+
+_engines = {}
+
+
+def get_engine(database_url: str):
+    """Return this process's engine for the given database, creating it on first use"""
+    if database_url not in _engines:
+        _engines[database_url] = create_engine(
+            database_url, connect_args={"check_same_thread": False, "timeout": 30}
+        )
+    return _engines[database_url]
+
+
+def utc_now() -> str:
+    """Current UTC time in the storage format SQLAlchemy uses for SQLite DateTime columns"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def update_job(engine, job_id: str, **fields):
+    """Write the given columns to a report_jobs row"""
+    assignments = ", ".join(f"{name} = :{name}" for name in fields)
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE report_jobs SET {assignments} WHERE id = :id"), {"id": job_id, **fields})
+
+
+def fetch_all(engine, sql: str, params: dict | None = None):
+    """Run a query and return every row, releasing the connection before the report is computed"""
+    with engine.connect() as conn:
+        return conn.execute(text(sql), params or {}).all()
+
+
+def iter_with_progress(rows, report_progress):
+    """Yield rows while reporting progress roughly PROGRESS_STEPS times"""
+    step = max(1, len(rows) // PROGRESS_STEPS)
+    for i, row in enumerate(rows, start=1):
+        yield row
+        if i % step == 0:
+            report_progress(i / len(rows))
+
+
+def cluster_summary(engine, params, report_progress):
+    """Per-PI and cluster-wide usage totals, including how many students are over their limits"""
+    rows = fetch_all(engine, "SELECT pi_name, usage, soft_limit, hard_limit, files FROM quotas")
+
+    pis = {}
+    for pi_name, usage, soft, hard, files in iter_with_progress(rows, report_progress):
+        pi = pis.setdefault(pi_name, {
+            "Number of Users": 0, "Total Usage": 0, "Total Soft Limit": 0,
+            "Total Hard Limit": 0, "Total Files": 0, "Over Soft Limit": 0, "Over Hard Limit": 0
+        })
+        pi["Number of Users"] += 1
+        pi["Total Usage"] += usage or 0
+        pi["Total Soft Limit"] += soft or 0
+        pi["Total Hard Limit"] += hard or 0
+        pi["Total Files"] += files or 0
+        pi["Over Soft Limit"] += bool(soft and usage >= soft)
+        pi["Over Hard Limit"] += bool(hard and usage >= hard)
+
+    cluster = {
+        "Number of PIs": len(pis),
+        "Number of Users": len(rows),
+        "Total Usage": round(sum(pi["Total Usage"] for pi in pis.values()), 1),
+        "Total Files": sum(pi["Total Files"] for pi in pis.values()),
+        "Over Soft Limit": sum(pi["Over Soft Limit"] for pi in pis.values()),
+        "Over Hard Limit": sum(pi["Over Hard Limit"] for pi in pis.values()),
+    }
+    for pi in pis.values():
+        pi["Total Usage"] = round(pi["Total Usage"], 1)
+    return {"Cluster": cluster, "PIs": pis}
+
+
+def quota_export(engine, params, report_progress):
+    """CSV export of quota rows, optionally restricted to one PI via params["pi"]"""
+    sql = "SELECT pi_name, student_name, usage, soft_limit, hard_limit, files FROM quotas"
+    if params.get("pi"):
+        rows = fetch_all(engine, sql + " WHERE pi_name = :pi ORDER BY student_name", {"pi": params["pi"]})
+    else:
+        rows = fetch_all(engine, sql + " ORDER BY pi_name, student_name")
+
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["pi", "student", "usage", "soft", "hard", "files"])
+    for row in iter_with_progress(rows, report_progress):
+        writer.writerow(row)
+    return {"Rows": len(rows), "CSV": out.getvalue()}
+
+
+def usage_forecast(engine, params, report_progress):
+    """Least-squares projection of each PI's total usage params["days"] (default 30) days ahead"""
+    days = float(params.get("days", 30))
+    rows = fetch_all(engine, "SELECT pi_name, timestamp, total_usage FROM summary_history ORDER BY timestamp")
+
+    history = {}
+    for pi_name, timestamp, total_usage in iter_with_progress(rows, report_progress):
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        history.setdefault(pi_name, []).append((timestamp.timestamp() / 86400, total_usage))
+
+    forecasts = {}
+    for pi_name, points in history.items():
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        var_x = sum((x - mean_x) ** 2 for x, _ in points)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x if var_x else 0.0
+        last_x, last_y = points[-1]
+        forecasts[pi_name] = {
+            "Samples": n,
+            "Current Usage": last_y,
+            "Daily Growth": round(slope, 3),
+            "Forecast Usage": round(last_y + slope * days, 1),
+        }
+    return {"Days Ahead": days, "PIs": forecasts}
+
+
+# kind -> (report function, tables it reads); the tables decide when a cached result goes stale
+REPORTS = {
+    "cluster_summary": (cluster_summary, ("quotas",)),
+    "quota_export": (quota_export, ("quotas",)),
+    "usage_forecast": (usage_forecast, ("summary_history",)),
+}
+
+
+def run_report(job_id: str, kind: str, params: dict, database_url: str):
+    """Worker entry point: compute a report and store its outcome on the job row"""
+    engine = get_engine(database_url)
+    update_job(engine, job_id, status="running", progress=0.0)
+
+    def report_progress(fraction):
+        update_job(engine, job_id, progress=round(min(fraction, 0.99), 2))
+
+    try:
+        report, _ = REPORTS[kind]
+        result = report(engine, params, report_progress)
+    except Exception as e:
+        update_job(engine, job_id, status="failed", error=str(e), finished_at=utc_now())
+        return
+
+    update_job(
+        engine, job_id,
+        status="done", progress=1.0, result=json.dumps(result), finished_at=utc_now()
+    )